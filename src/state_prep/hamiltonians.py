@@ -1,16 +1,32 @@
 from dataclasses import dataclass
-from typing import Callable, List
+from typing import Callable, List, Tuple
 
 import centrex_tlf
+import numpy as np
 
 from .electric_fields import ElectricField
 from .magnetic_fields import MagneticField
 from .trajectory import Trajectory
-from .utils import make_hamiltonian, make_QN
+from .utils import find_blocks, make_hamiltonian, make_QN
 
 
 class Hamiltonian:
-    pass
+    def get_H_t_batch_func(self) -> Callable:
+        """
+        Returns a function that gives the Hamiltonian at each time in an array of
+        times, stacked into an array of shape (len(ts), N, N).
+        """
+        H_t = self.get_H_t_func()
+
+        return lambda ts: np.array([H_t(t) for t in ts])
+
+    def get_blocks(self, t_array: np.ndarray = None) -> List[np.ndarray]:
+        """
+        Returns the basis indices of the blocks that the Hamiltonian is
+        block-diagonal in at all times in t_array. By default the whole basis is a
+        single block.
+        """
+        return [np.arange(len(self.QN))]
 
 
 @dataclass
@@ -48,6 +64,70 @@ class SlowHamiltonian(Hamiltonian):
         """
         return lambda t: self.H_R(self.trajectory.R_t(t))
 
+    def get_field_hamiltonians(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the field-free Hamiltonian and the Hamiltonians per unit of each
+        field component (Ex, Ey, Ez, Bx, By, Bz), with shape (6, N, N).
+
+        These are found by evaluating H_EB at zero field and at unit fields, so they
+        follow the same conventions as H_EB.
+        """
+        if not hasattr(self, "_H_fields"):
+            zero = np.zeros(3)
+            H_0 = self.H_EB(zero, zero)
+            H_fields = [self.H_EB(e, zero) - H_0 for e in np.eye(3)]
+            H_fields += [self.H_EB(zero, b) - H_0 for b in np.eye(3)]
+            self._H_0 = H_0
+            self._H_fields = np.array(H_fields)
+
+        return self._H_0, self._H_fields
+
+    def get_H_t_batch_func(self) -> Callable:
+        """
+        Returns a function that gives the slow Hamiltonian at each time in an array
+        of times, stacked into an array of shape (len(ts), N, N).
+
+        The Hamiltonian is linear in the field components, so all times are
+        evaluated with a single matrix product of the fields with the flattened
+        Hamiltonians per unit field.
+        """
+        H_0, H_fields = self.get_field_hamiltonians()
+        N = len(self.QN)
+        H_fields = H_fields.reshape(6, N * N)
+
+        def H_t_batch(ts: np.ndarray) -> np.ndarray:
+            Rs = [self.trajectory.R_t(t) for t in ts]
+            fields = np.array(
+                [
+                    np.concatenate(
+                        (self.electric_field.E_R(R), self.magnetic_field.B_R(R))
+                    )
+                    for R in Rs
+                ]
+            )
+            return H_0 + (fields @ H_fields).reshape(len(ts), N, N)
+
+        return H_t_batch
+
+    def get_blocks(self, t_array: np.ndarray = None) -> List[np.ndarray]:
+        """
+        Returns the basis indices of the blocks that the Hamiltonian is
+        block-diagonal in at all times in t_array, based on which field components
+        are non-zero along the trajectory. If t_array is not given, all field
+        components are assumed to be non-zero.
+        """
+        if t_array is None:
+            active = np.ones(6, dtype=bool)
+        else:
+            Rs = [self.trajectory.R_t(t) for t in t_array]
+            E_active = np.any([self.electric_field.E_R(R) != 0 for R in Rs], axis=0)
+            B_active = np.any([self.magnetic_field.B_R(R) != 0 for R in Rs], axis=0)
+            active = np.concatenate((E_active, B_active))
+
+        H_0, H_fields = self.get_field_hamiltonians()
+
+        return find_blocks([H_0] + list(H_fields[active]))
+
 
 @dataclass
 class SlowHamiltonianOld(Hamiltonian):
@@ -7,8 +7,7 @@ from centrex_tlf.constants import XConstants
 from centrex_tlf.couplings.matrix_elements import calculate_ED_ME_mixed_state
 from centrex_tlf.hamiltonian.wigner import threej_f
 from centrex_tlf.states import State
-from scipy import constants
-from scipy.differentiate import derivative
+from scipy import constants, sparse
 
 from .intensity_profiles import Intensity
 
@@ -53,37 +52,18 @@ class Polarization:
         dir = direction of longitudinal polarization if other than k-vector
               (useful if using multiple bases)
         """
-        # Take div of E_R along main polarization
-        div = 0
         p_main_ini = self.p_R_main(R)
 
         # Convert polarization vector to XYZ basis using the provided basis conversion
-        # vector
-        p_main = np.array(
-            [
-                np.dot(self.basis_conversion[0], p_main_ini),
-                np.dot(self.basis_conversion[1], p_main_ini),
-                np.dot(self.basis_conversion[2], p_main_ini),
-            ]
-        )
-        # print(p_main)
-
-        # Calculate each component of divergence
-        for i in range(3):
-            unit_vec = np.zeros(R.shape)
-            unit_vec[i] = 1
-            # func = lambda x: (ip.E_R(R=(R + x * unit_vec)) / ip.E_R(R=ip.R0))
-
-            dx = 1e-5
-            deriv = (
-                (ip.E_R(R=(R + dx / 2 * unit_vec)) - ip.E_R(R=(R - dx / 2 * unit_vec)))
-                / ip.E_R(R=ip.R0)
-                / dx
-            )
-
-            # print(deriv*p_main[i])
+        # vectors
+        p_main = np.array(self.basis_conversion) @ p_main_ini
 
-            div += deriv * p_main[i]
+        # Take div of E_R along main polarization, calculating each component with a
+        # central difference normalized by the field at the center of the profile
+        dx = 1e-5
+        steps = dx / 2 * np.eye(3)
+        dE = np.array([ip.E_R(R=(R + step)) - ip.E_R(R=(R - step)) for step in steps])
+        div = dE @ p_main / ip.E_R(R=ip.R0) / dx
 
         # Calculate wavenumber for field
         k = 2 * np.pi * freq / constants.c
@@ -158,6 +138,30 @@ class MicrowaveField:
         Returns a function that gives Hamiltonian for the microwave field as a
         function of time.
         """
+        # Find the amplitudes of the x,y,z couplings as a function of time
+        amps_t = self.get_amps_t_func(R_t)
+
+        # Find upper and lower triangular parts of coupling matrices
+        Hu_x, Hu_y, Hu_z = tuple([sparse.triu(H, format="csr") for H in self.H_sparse])
+        Hl_x, Hl_y, Hl_z = tuple([sparse.tril(H, format="csr") for H in self.H_sparse])
+
+        def H_t(t: float) -> np.ndarray:
+            a = amps_t(t)
+            ad = a.conj()
+
+            return (
+                (a[0] * Hu_x + a[1] * Hu_y + a[2] * Hu_z)
+                + (ad[0] * Hl_x + ad[1] * Hl_y + ad[2] * Hl_z)
+            ).toarray()
+
+        return H_t
+
+    def get_amps_t_func(self, R_t: Callable) -> Callable:
+        """
+        Returns a function that gives the complex amplitudes multiplying the upper
+        triangular parts of the x,y,z coupling matrices in H_list as a function of
+        time. The lower triangular parts are multiplied by the complex conjugates.
+        """
         # Find the electric field due to the microwaves as a function of time
         E_mu_t = lambda t: self.intensity.E_R(R_t(t))
         self.E_t = E_mu_t
@@ -166,21 +170,23 @@ class MicrowaveField:
         p_mu_t = lambda t: self.polarization.p_R(R_t(t), self.intensity, self.muW_freq)
         self.p_t = p_mu_t
 
-        # Find upper and lower triangular parts of coupling matrices
-        Hu_x, Hu_y, Hu_z = tuple([np.triu(H) for H in self.H_list])
-        Hl_x, Hl_y, Hl_z = tuple([np.tril(H) for H in self.H_list])
+        def amps_t(t: float) -> np.ndarray:
+            return (2 * np.pi * XConstants.D_TlF * E_mu_t(t) / 2) * p_mu_t(t)
 
-        def H_t(t: float) -> np.ndarray:
-            E = E_mu_t(t)
-            p = p_mu_t(t)
-            pd = p.conj()
+        return amps_t
 
-            return (2 * np.pi * XConstants.D_TlF * E / 2) * (
-                (p[0] * Hu_x + p[1] * Hu_y + p[2] * Hu_z)
-                + (pd[0] * Hl_x + pd[1] * Hl_y + pd[2] * Hl_z)
-            )
+    def get_coupling_matrix_sparse(self) -> sparse.csc_matrix:
+        """
+        Returns the upper and lower triangular parts of the x,y,z coupling matrices
+        flattened into the columns of a sparse matrix, so that the microwave
+        Hamiltonian is the product of this matrix with the vector
+        [a, a.conj()] of amplitudes, reshaped to a square matrix.
+        """
+        H_parts = [sparse.triu(H) for H in self.H_sparse] + [
+            sparse.tril(H) for H in self.H_sparse
+        ]
 
-        return H_t
+        return sparse.hstack([H.reshape((-1, 1)) for H in H_parts], format="csc")
 
     def generate_coupling_matrices(
         self, QN: List[centrex_tlf.states.UncoupledBasisState]
@@ -217,6 +223,10 @@ class MicrowaveField:
 
         self.H_list = H_list
 
+        # Most elements are zero due to selection rules, so also store the coupling
+        # matrices in sparse format
+        self.H_sparse = [sparse.csr_matrix(H) for H in H_list]
+
     def generate_D(
         self, QN: List[centrex_tlf.states.State], omega: float = None
     ) -> None:
@@ -348,21 +358,17 @@ def make_H_mu(J1, J2, QN, pol_vec=np.array((0, 0, 1))):
     # Initialize a Hamiltonian
     H_mu = np.zeros((N_states, N_states), dtype=complex)
 
-    # Start looping over states and calculate microwave matrix elements between them
-    for i in range(0, N_states):
-        state1 = QN[i]
-
-        for j in range(i, N_states):
-            state2 = QN[j]
-
-            # Check that the states have the correct values of J
-            if (state1.J == J1 and state2.J == J2) or (
-                state1.J == J2 and state2.J == J1
-            ):
-                # Calculate matrix element between the two states
-                H_mu[i, j] = calculate_microwave_ME(
-                    state1, state2, reduced=False, pol_vec=pol_vec
-                )
+    # Find the pairs of states in the upper triangle that have the correct values
+    # of J
+    Js = np.array([state.J for state in QN])
+    mask = (Js[:, np.newaxis] == J1) & (Js[np.newaxis, :] == J2)
+    i_arr, j_arr = np.nonzero(np.triu(mask | mask.T))
+
+    # Calculate microwave matrix elements between the pairs of states
+    H_mu[i_arr, j_arr] = [
+        calculate_microwave_ME(QN[i], QN[j], reduced=False, pol_vec=pol_vec)
+        for i, j in zip(i_arr, j_arr)
+    ]
 
     # Make H_mu hermitian
     H_mu = (H_mu + np.conj(H_mu.T)) - np.diag(np.diag(H_mu))
@@ -1,5 +1,5 @@
 import pickle
-from copy import deepcopy
+from copy import copy, deepcopy
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Callable, List, Optional, Tuple
@@ -8,6 +8,9 @@ import centrex_tlf
 import dill
 import matplotlib.pyplot as plt
 import numpy as np
+from joblib import Parallel, delayed
+from scipy import sparse
+from scipy.linalg.blas import zgemm
 from scipy.linalg.lapack import zheevd
 from tqdm import tqdm
 
@@ -29,7 +32,9 @@ class SimulationResult:
                       initial_states
     energies        : energies of all eigenstates of the hamiltonian at each time (2pi*Hz)
     probabilities   : for each state in initial staets, the probability of being found in
-                      each eigenstate of the hamiltonian
+                      each eigenstate of the hamiltonian, stored with shape
+                      (n_initial_states, n_states, n_times) so the time series for
+                      a given pair of states is contiguous
     V_ref           : reference matrix of eigenstates of hamiltonian which tells what state each
                       index of energies and states corresponds to
     """
@@ -47,10 +52,24 @@ class SimulationResult:
     V_ini: np.ndarray
     V_fin: np.ndarray
 
+    # Attributes that are saved in native numpy format by save_to_pickle
+    _array_attributes = (
+        "t_array",
+        "z_array",
+        "psis",
+        "energies",
+        "probabilities",
+        "V_ini",
+        "V_fin",
+    )
+
     def __post_init__(self):
         # Generate array of positions
         self.z_array = self.t_array * self.trajectory.Vini[2] + self.trajectory.Rini[2]
 
+        # Cache for state vectors of the states that results are requested for
+        self._state_vec_cache = {}
+
     def plot_state_probability(
         self,
         state: centrex_tlf.states.UncoupledState,
@@ -121,11 +140,9 @@ class SimulationResult:
         """
         index_ini = self.initial_states.index(initial_state)
 
-        index_state = find_max_overlap_idx(
-            state.state_vector(self.hamiltonian.QN), self.V_ini
-        )
+        index_state = find_max_overlap_idx(self._state_vector(state), self.V_ini)
 
-        return self.probabilities[:, index_ini, index_state]
+        return self.probabilities[index_ini, index_state, :]
 
     def find_large_prob_states(
         self, initial_state: centrex_tlf.states.UncoupledState, N: int = 5
@@ -135,7 +152,7 @@ class SimulationResult:
         state.
         """
         index_ini = self.initial_states.index(initial_state)
-        index = np.argsort(-np.mean(self.probabilities[:, index_ini, :], axis=0))[:N]
+        index = np.argsort(-np.mean(self.probabilities[index_ini, :, :], axis=1))[:N]
 
         state_vecs = self.V_ini[:, index]
         states = []
@@ -193,9 +210,7 @@ class SimulationResult:
         Gets the energy of state for all values in t_array.
         """
 
-        index_state = find_max_overlap_idx(
-            state.state_vector(self.hamiltonian.QN), self.V_ini
-        )
+        index_state = find_max_overlap_idx(self._state_vector(state), self.V_ini)
 
         return self.energies[:, index_state]
 
@@ -208,18 +223,68 @@ class SimulationResult:
         Corresponds (somewhat) to diabatic following of eigenstates
         """
 
-        index_state = find_max_overlap_idx(
-            state.state_vector(self.hamiltonian.QN), self.V_ini
-        )
+        index_state = find_max_overlap_idx(self._state_vector(state), self.V_ini)
 
         return self.energies_diabatic[:, index_state]
 
+    def _state_vector(self, state: centrex_tlf.states.State) -> np.ndarray:
+        """
+        Returns the state vector of state in the basis of the Hamiltonian, caching
+        it so repeated lookups of the same state don't have to expand it again.
+        """
+        # Results loaded from a pickle don't run __post_init__
+        if not hasattr(self, "_state_vec_cache"):
+            self._state_vec_cache = {}
+
+        # Store the state itself with its vector, since an id can be reused once the
+        # original object is garbage collected
+        cached = self._state_vec_cache.get(id(state))
+        if cached is None or cached[0] is not state:
+            cached = (state, state.state_vector(self.hamiltonian.QN))
+            self._state_vec_cache[id(state)] = cached
+
+        return cached[1]
+
     def save_to_pickle(self, path: Path) -> None:
         """
-        Saves the result to a pickle.
+        Saves the result to a pickle. The large arrays are stored separately in a
+        compressed .npz file at the path of the pickle with ".npz" appended, which
+        avoids serializing them through dill.
+
+        Note that the arrays in the pickle itself are set to None, so results saved
+        this way have to be loaded with load_from_pickle instead of dill.load.
         """
+        path = Path(path)
+
+        # Save the arrays in numpy's native format
+        arrays = {name: getattr(self, name) for name in self._array_attributes}
+        np.savez_compressed(path.with_name(path.name + ".npz"), **arrays)
+
+        # Pickle the rest of the result without the arrays
+        metadata = copy(self)
+        metadata._state_vec_cache = {}
+        for name in arrays:
+            setattr(metadata, name, None)
         with open(path, "wb+") as f:
-            dill.dump(self, f)
+            dill.dump(metadata, f)
+
+    @classmethod
+    def load_from_pickle(cls, path: Path) -> "SimulationResult":
+        """
+        Loads a result saved with save_to_pickle.
+        """
+        path = Path(path)
+        with open(path, "rb") as f:
+            result = dill.load(f)
+
+        # Results pickled as a whole don't have a separate file for the arrays
+        npz_path = path.with_name(path.name + ".npz")
+        if npz_path.exists():
+            with np.load(npz_path) as arrays:
+                for name in arrays.files:
+                    setattr(result, name, arrays[name])
+
+        return result
 
 
 @dataclass
@@ -238,6 +303,7 @@ class Simulator:
     def __post_init__(self):
         self.psis = np.array([])
         self.initial_states = []
+        self.set_blocks([np.arange(len(self.hamiltonian.QN))])
 
     def run(
         self,
@@ -255,26 +321,23 @@ class Simulator:
         # Function of B-field over time
         B_t = self.magnetic_field.get_B_t_func(self.trajectory.R_t)
 
-        # Generate Hamiltonian that has slow time-evolution included
-        H_t = self.hamiltonian.get_H_t_func()
+        # Generate Hamiltonian that has slow time-evolution included, evaluated for
+        # arrays of times
+        H_t_batch = self.hamiltonian.get_H_t_batch_func()
 
         # Generate Hamiltonians for microwaves
         if self.microwave_fields is not None:
             # Initialize matrix for shifting energies in rotating frame
             D_mu = np.zeros((len(self.hamiltonian.QN), len(self.hamiltonian.QN)))
 
-            # Initialize container for Hamiltonians
-            muw_hams = []
+            # Initialize container for functions giving the coupling amplitudes
+            muw_amps = []
 
             # Container for frequencies of all microwaves
             omegas = []
 
             for microwave_field in self.microwave_fields:
-                muw_hams.append(
-                    microwave_field.get_H_t_func(
-                        self.trajectory.R_t, self.hamiltonian.QN
-                    )
-                )
+                muw_amps.append(microwave_field.get_amps_t_func(self.trajectory.R_t))
                 # Background fields should always be at the same frequency as
                 # as main field so don't do the shifting for them
                 # Olivier: the background field can be at a different frequency, for
@@ -291,25 +354,46 @@ class Simulator:
                         )
                     D_mu += microwave_field.D
 
-            # Generate function that gives couplings due to all microwaves
-            def H_mu_tot_t(t):
-                H_mu_tot = muw_hams[0](t)
-                if len(muw_hams) > 1:
-                    for H_mu_t in muw_hams[1:]:
-                        H_mu_tot = H_mu_tot + H_mu_t(t)
-                return H_mu_tot
+            # Stack the time-independent coupling matrices of all microwaves so that
+            # the total couplings at an array of times are a single sparse
+            # matrix product with the coupling amplitudes
+            H_mu_couplings = sparse.hstack(
+                [mf.get_coupling_matrix_sparse() for mf in self.microwave_fields],
+                format="csc",
+            )
+            N = len(self.hamiltonian.QN)
+
+            # Generate function that gives couplings due to all microwaves at each
+            # time in an array of times
+            def H_mu_tot_batch(ts):
+                amps = np.array([[amps_t(t) for t in ts] for amps_t in muw_amps])
+                amps = np.concatenate((amps, amps.conj()), axis=2)
+                amps = amps.transpose(0, 2, 1).reshape(-1, len(ts))
+                return (H_mu_couplings @ amps).T.reshape(len(ts), N, N)
 
         # Generate time array
         t_array = np.linspace(0, T, N_steps)
 
+        # Find the blocks that the slow Hamiltonian is block-diagonal in along the
+        # trajectory so it can be diagonalized one block at a time
+        self.set_blocks(self.hamiltonian.get_blocks(t_array))
+
         # Perform time-evolution
         if self.microwave_fields is None:
             (psis_t, energies, probabilities, V_ini, V_fin) = self._time_evolve(
-                H_t, t_array
+                H_t_batch, t_array
             )
         else:
             psis_t, energies, probabilities, V_ini, V_fin = self._time_evolve_mu(
-                H_t, H_mu_tot_t, D_mu, t_array
+                H_t_batch, H_mu_tot_batch, D_mu, t_array
+            )
+
+        # Check that the state vectors have stayed normalized
+        norm_drift = np.max(np.abs(np.sum(np.abs(psis_t[-1]) ** 2, axis=1) - 1))
+        if norm_drift > 1e-4:
+            print(
+                "Warning: state vector norms drifted by {:.1e} during time "
+                "evolution!".format(norm_drift)
             )
 
         # Generate a result object
@@ -330,6 +414,33 @@ class Simulator:
 
         return result
 
+    def run_batch(
+        self,
+        param_list: List[Callable],
+        n_jobs: int = -1,
+        N_steps=int(1e4),
+    ) -> List[SimulationResult]:
+        """
+        Runs one simulation per element of param_list in parallel.
+
+        Each element of param_list is a function that takes a copy of the simulator
+        and modifies it in place (e.g. sets the microwave power or the trajectory)
+        before that copy is run. joblib limits the number of BLAS threads in each
+        worker so the workers don't oversubscribe the CPU cores.
+        """
+        return Parallel(n_jobs=n_jobs, backend="loky")(
+            delayed(self._run_one)(params, N_steps) for params in param_list
+        )
+
+    def _run_one(self, params: Callable, N_steps: int) -> SimulationResult:
+        """
+        Runs the simulation for a copy of the simulator modified by params.
+        """
+        simulator = deepcopy(self)
+        params(simulator)
+
+        return simulator.run(N_steps=N_steps)
+
     def init_state_vecs(self, H_0) -> None:
         """
         Generates state vectors based on self.initial_states in the basis
@@ -338,23 +449,103 @@ class Simulator:
 
         # Find the eigenstates of the Hamiltonian that most closely correspond to the
         # initial states
-        initial_states = []
-        psis = []
         _, V = np.linalg.eigh(H_0)
-        for state in self.initial_states_approx:
-            idx = find_max_overlap_idx(state.state_vector(self.hamiltonian.QN), V)
-            psis.append(V[:, idx])
-            initial_states.append(vector_to_state(V[:, idx], self.hamiltonian.QN))
-        self.psis = np.array(psis)
-        self.initial_states = initial_states
+        state_vecs = np.column_stack(
+            [
+                state.state_vector(self.hamiltonian.QN)
+                for state in self.initial_states_approx
+            ]
+        )
+        idxs = find_max_overlap_idx(state_vecs, V)
+        self.psis = V[:, idxs].T
+        self.initial_states = [
+            vector_to_state(V[:, idx], self.hamiltonian.QN) for idx in idxs
+        ]
 
-    def _time_evolve(self, H_slow: Callable, t_array: np.ndarray):
+    def set_blocks(self, blocks: List[np.ndarray]) -> None:
         """
-        Time evolves the system using the Hamiltonian function H_t
-        over the time period in t_array.
+        Sets the blocks of basis indices that the slow Hamiltonian is
+        block-diagonal in.
+        """
+        # Permutation that makes each block contiguous and the slices of the
+        # permuted basis that correspond to each block
+        self.block_perm = np.concatenate(blocks)
+        bounds = np.cumsum([0] + [len(block) for block in blocks])
+        self.block_slices = tuple(
+            slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])
+        )
+
+    def _diagonalize(self, H: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Diagonalizes the slow Hamiltonian H one block at a time. Eigenvalues are
+        not sorted across blocks.
+
+        All eigenpairs are computed: the propagator is built from the full spectral
+        decomposition and every eigenvector is tracked when reordering, so a subset
+        of the spectrum (e.g. with zheevr) can't be used here.
+        """
+        # No block structure, diagonalize the full matrix
+        if len(self.block_slices) == 1:
+            D, V, info = zheevd(H)
+            if info != 0:
+                D, V = np.linalg.eigh(H)
+            return D, V
+
+        P = self.block_perm
+        H_perm = H[np.ix_(P, P)]
+        D = np.empty(H.shape[0])
+        V = np.zeros(H.shape, dtype=complex)
+        for block in self.block_slices:
+            D_b, V_b, info = zheevd(H_perm[block, block])
+            if info != 0:
+                D_b, V_b = np.linalg.eigh(H_perm[block, block])
+            D[block] = D_b
+            V[P[block], block] = V_b
+
+        return D, V
+
+    def _diagonalize_batch(self, H: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Diagonalizes a stack of slow Hamiltonians with shape (K, N, N) one block at
+        a time, using a single batched call to eigh per block. Falls back to
+        diagonalizing each Hamiltonian separately if the batched call fails.
+        """
+        try:
+            # No block structure, diagonalize the full matrices
+            if len(self.block_slices) == 1:
+                return np.linalg.eigh(H)
+
+            P = self.block_perm
+            H_perm = H[:, P[:, np.newaxis], P[np.newaxis, :]]
+            D = np.empty(H.shape[:2])
+            V = np.zeros(H.shape, dtype=complex)
+            for block in self.block_slices:
+                D[:, block], V[:, P[block], block] = np.linalg.eigh(
+                    H_perm[:, block, block]
+                )
+
+            return D, V
+
+        except np.linalg.LinAlgError:
+            Ds, Vs = zip(*[self._diagonalize(H_i) for H_i in H])
+            return np.array(Ds), np.array(Vs)
+
+    def _time_evolve(
+        self, H_slow_batch: Callable, t_array: np.ndarray, chunk_size: int = 256
+    ):
+        """
+        Time evolves the system using the Hamiltonian function H_slow_batch, which
+        gives the Hamiltonian for an array of times, over the time period in t_array.
+
+        The Hamiltonians are evaluated and diagonalized in batches of chunk_size
+        timesteps. The propagator is formed from the eigendecomposition rather than
+        by applying exp(-iH dt) with a Krylov/Taylor method such as expm_multiply:
+        the spread of the rotational energies makes |H dt| ~ 1e5, which such
+        methods need a comparable number of matrix-vector products to handle, and
+        the eigendecomposition is needed for the energies and probabilities anyway.
         """
         # Calculate Hamiltonian at tini
-        H_tini = H_slow(t_array[0])
+        H_tini = H_slow_batch(t_array[:1])[0]
 
         # Initialize state vectors
         self.init_state_vecs(H_tini)
@@ -368,34 +559,39 @@ class Simulator:
         E_ref, V_ref = np.linalg.eigh(H_tini)
         V_ref_ini = V_ref
 
+        # Timestep is uniform since t_array is generated with np.linspace
+        dt = t_array[1] - t_array[0]
+
+        # Preallocate buffer for the phases accumulated by the eigenstates
+        phase = np.empty(len(self.hamiltonian.QN), dtype=complex)
+
         # Loop over t_array to time-evolve
         for i, t in enumerate(tqdm(t_array[:-1])):
-            # Calculate the timestep
-            dt = t_array[i + 1] - t_array[i]
-
-            # Calculate Hamiltonian
-            H_slow_i = H_slow(t)
+            # Calculate and diagonalize Hamiltonians for the next chunk of timesteps
+            j = i % chunk_size
+            if j == 0:
+                H_chunk = H_slow_batch(t_array[:-1][i : i + chunk_size])
+                D_chunk, V_chunk = self._diagonalize_batch(H_chunk)
 
-            # Diagonalize Hamiltonian
-            D, V, info = zheevd(H_slow_i)
-            if info != 0:
-                D, V = np.linalg.eigh(H_slow_i)
+            D = D_chunk[j]
+            V = V_chunk[j]
 
             # Reorder eigenvectors and energies
             Es, evecs = reorder_evecs(V, D, V_ref)
             Es_diabatic, _ = reorder_evecs(V, D, V_ref_ini)
 
-            # Calculate propagator for the system
-            U_dt = V @ np.diag(np.exp(-1j * D * dt)) @ V.conj().T
+            # Calculate phases accumulated by the eigenstates
+            np.multiply(-1j * dt, D, out=phase)
+            np.exp(phase, out=phase)
 
             # Apply propagator to each state vector
-            self.psis = np.einsum("ij,kj->ki", U_dt, self.psis)
+            self.psis = self.apply_propagator(self.psis, V, phase)
 
             # Store results for this timestep
             psis_t[i + 1, :, :] = self.psis
             energies[i + 1, :] = Es
             energies_diabatic[i + 1, :] = Es_diabatic
-            probabilities[i + 1, :, :] = self.calculate_probabilities(self.psis, evecs)
+            probabilities[:, :, i + 1] = self.calculate_probabilities(self.psis, evecs)
 
             # Change V_ref
             V_ref = evecs
@@ -404,17 +600,21 @@ class Simulator:
 
     def _time_evolve_mu(
         self,
-        H_slow_t: Callable,
-        H_mu_t: Callable,
+        H_slow_batch: Callable,
+        H_mu_batch: Callable,
         D_mu: np.ndarray,
         t_array: np.ndarray,
+        chunk_size: int = 256,
     ):
         """
-        Time evolves the system using the Hamiltonian function H_t
-        over the time period in t_array.
+        Time evolves the system using the Hamiltonian functions H_slow_batch and
+        H_mu_batch, which give the Hamiltonians for an array of times, over the
+        time period in t_array.
+
+        The propagators are calculated in batches of chunk_size timesteps.
         """
         # Calculate Hamiltonian at tini
-        H_tini = H_slow_t(t_array[0])
+        H_tini = H_slow_batch(t_array[:1])[0]
 
         # Initialize state vectors
         self.init_state_vecs(H_tini)
@@ -423,65 +623,94 @@ class Simulator:
         psis_t, energies, probabilities = self._init_results_containers(t_array, H_tini)
 
         # Initialize reference matrix of eigenvectors that is used to keep track
-        # of adiabatic evolution of eigenstates
+        # of adiabatic evolution of eigenstates (eigh returns the eigenvalues in
+        # ascending order)
         E_ref, V_ref = np.linalg.eigh(H_tini)
-        index = np.argsort(E_ref)
-        E_ref = E_ref[index]
-        V_ref = V_ref[:, index]
         V_ref_ini = V_ref
 
+        # Timestep is uniform since t_array is generated with np.linspace
+        dt = t_array[1] - t_array[0]
+
         # Loop over t_array to time-evolve
         for i, t in enumerate(tqdm(t_array[:-1])):
-            # Calculate the timestep
-            dt = t_array[i + 1] - t_array[i]
-
-            # Calculate Hamiltonians
-            H_slow_i = H_slow_t(t)
-            H_mu_i = H_mu_t(t)
-
-            # Diagonalize slow Hamiltonian and transfer to basis where it is
-            # diagonal
-            D, V, info = zheevd(H_slow_i)
-            if info != 0:
-                D, V = np.linalg.eigh(H_slow_i)
-
-            # Sort the eigenvalues so they are in ascending order
-            index = np.argsort(D)
-            D = D[index]
-            V = V[:, index]
-
-            # Make Hamiltonian in rotating frame
-            H_rot = V.conj().T @ (H_slow_i + H_mu_i) @ V + D_mu
-
-            # Diagonalize the Hamiltonian in the rotating frame
-            D_rot, V_rot, info_rot = zheevd(H_rot)
-            if info_rot != 0:
-                print("zheevd didn't work for H_rot")
-                D_rot, V_rot = np.linalg.eigh(H_rot)
+            # Calculate the propagators for the next chunk of timesteps
+            j = i % chunk_size
+            if j == 0:
+                D_chunk, V_chunk, A_chunk, phase_chunk = self._propagators_mu(
+                    H_slow_batch, H_mu_batch, D_mu, t_array[:-1][i : i + chunk_size], dt
+                )
 
             # Reorder eigenvectors and energies
-            Es, evecs = D, V
-            Es, evecs = reorder_evecs(evecs, Es, V_ref)
-
-            # Compute the propagator
-            # Combine the unitary matrices
-            A = V @ V_rot
-
-            U_dt = (A * np.exp(-1j * D_rot * dt)[np.newaxis, :]) @ A.conj().T
+            Es, evecs = reorder_evecs(V_chunk[j], D_chunk[j], V_ref)
 
             # Apply propagator to each state vector
-            self.psis = self.psis.dot(U_dt.T)
+            self.psis = self.apply_propagator(self.psis, A_chunk[j], phase_chunk[j])
 
             # Store results for this timestep
             psis_t[i + 1, :, :] = self.psis
             energies[i + 1, :] = Es
-            probabilities[i + 1, :, :] = self.calculate_probabilities(self.psis, evecs)
+            probabilities[:, :, i + 1] = self.calculate_probabilities(self.psis, evecs)
 
             # Change V_ref
             V_ref = evecs
 
         return psis_t, energies, probabilities, V_ref_ini, V_ref
 
+    def _propagators_mu(
+        self,
+        H_slow_batch: Callable,
+        H_mu_batch: Callable,
+        D_mu: np.ndarray,
+        ts: np.ndarray,
+        dt: float,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calculates the eigenvalues and eigenvectors of the slow Hamiltonian and the
+        propagator over the timestep dt for all times in ts, using batched
+        operations over the stacked (len(ts), N, N) matrices.
+
+        The propagators are returned as the unitary matrices A and the phases such
+        that U_dt = A @ diag(phase) @ A^dagger.
+        """
+        # Calculate Hamiltonians
+        H_slow = H_slow_batch(ts)
+        H_mu = H_mu_batch(ts)
+
+        # Diagonalize slow Hamiltonians. The eigenvalues need to be in ascending
+        # order, which eigh already guarantees for a single block, so they only
+        # need sorting when the Hamiltonian was diagonalized block by block
+        D, V = self._diagonalize_batch(H_slow)
+        if len(self.block_slices) > 1:
+            index = np.argsort(D, axis=1)
+            D = np.take_along_axis(D, index, axis=1)
+            V = np.take_along_axis(V, index[:, np.newaxis, :], axis=2)
+
+        # Make Hamiltonians in rotating frame
+        H_rot = V.conj().transpose(0, 2, 1) @ (H_slow + H_mu) @ V + D_mu
+
+        # Diagonalize the Hamiltonians in the rotating frame
+        D_rot, V_rot = np.linalg.eigh(H_rot)
+
+        # Compute the propagators
+        # Combine the unitary matrices
+        A = V @ V_rot
+        phase = np.exp(-1j * D_rot * dt)
+
+        return D, V, A, phase
+
+    def apply_propagator(
+        self, psis: np.ndarray, A: np.ndarray, phase: np.ndarray
+    ) -> np.ndarray:
+        """
+        Applies the propagator U_dt = A @ diag(phase) @ A^dagger to each state vector
+        in psis (one per row) without forming U_dt. zgemm applies the conjugate
+        transpose of A, so it isn't materialized either.
+        """
+        # Components of the state vectors along the columns of A
+        overlaps = zgemm(1.0, A, psis, trans_a=2, trans_b=1)
+
+        return zgemm(1.0, overlaps * phase[:, np.newaxis], A, trans_a=1, trans_b=1)
+
     def _init_results_containers(self, t_array: np.ndarray, H_tini: np.ndarray):
         """
         Initializes containers for time evolution results based on array of times
@@ -497,15 +726,17 @@ class Simulator:
         # Storage for energies
         energies = np.zeros((len(t_array), len(self.hamiltonian.QN)))
 
-        # Storage for state probabilities
-        probabilities = np.zeros(psis_t.shape)
+        # Storage for state probabilities, with time along the last axis
+        probabilities = np.zeros(
+            (len(self.initial_states), len(self.hamiltonian.QN), len(t_array))
+        )
 
         # Calculate values for energies and probabilities at t_ini
         D, V = np.linalg.eigh(H_tini)
 
         # Store values
         energies[0, :] = D
-        probabilities[0, :, :] = self.calculate_probabilities(self.psis, V)
+        probabilities[:, :, 0] = self.calculate_probabilities(self.psis, V)
 
         return psis_t, energies, probabilities
 
@@ -519,6 +750,8 @@ class Simulator:
         #     overlaps_list.append(V.conj().T @ psi)
         # overlaps = np.array(overlaps_list)
 
-        overlaps = np.einsum("ij,kj->ki", V.conj().T, psis)
+        # Overlaps as V^dagger @ psis^T, letting zgemm apply the conjugate transpose
+        # of V so that V.conj() is not materialized
+        overlaps = zgemm(1.0, V, psis, trans_a=2, trans_b=1)
 
-        return np.abs(overlaps) ** 2
+        return (overlaps.real**2 + overlaps.imag**2).T
@@ -1,5 +1,5 @@
 import pickle
-from typing import Sequence, Tuple
+from typing import List, Sequence, Tuple
 
 import numpy as np
 import numpy.typing as npt
@@ -11,6 +11,7 @@ from centrex_tlf.states import (
     UncoupledState,
     find_closest_vector_idx,
 )
+from scipy.sparse.csgraph import connected_components
 
 
 def vector_to_state(
@@ -73,12 +74,19 @@ def matrix_to_states(
     return eigenstates
 
 
-def find_max_overlap_idx(state_vec: np.ndarray, V_matrix: np.ndarray) -> int:
+def find_max_overlap_idx(
+    state_vec: np.ndarray, V_matrix: np.ndarray
+) -> int | np.ndarray:
+    """
+    Finds the index of the eigenvector (column of V_matrix) that has the largest
+    overlap with state_vec. If state_vec is a matrix, the index is found for each of
+    its columns and an array of indices is returned.
+    """
     # Take dot product between each eigenvector in V and state_vec
     overlap_vectors = np.absolute(V_matrix.conj().T @ state_vec)
 
     # Find index of state that has the largest overlap
-    index = np.argmax(overlap_vectors)
+    index = np.argmax(overlap_vectors, axis=0)
 
     return index
 
@@ -103,6 +111,22 @@ def reorder_evecs(
     return E_out, V_out
 
 
+def find_blocks(matrices: Sequence[np.ndarray]) -> List[np.ndarray]:
+    """
+    Finds the blocks that any linear combination of the given matrices is
+    block-diagonal in. Returns a list of arrays with the basis indices in each block.
+    """
+    # Two basis states are in the same block if any of the matrices couples them
+    pattern = np.zeros(matrices[0].shape, dtype=bool)
+    for matrix in matrices:
+        pattern |= matrix != 0
+
+    # Blocks are the connected components of the coupling graph
+    N_blocks, labels = connected_components(pattern, directed=False)
+
+    return [np.flatnonzero(labels == i) for i in range(N_blocks)]
+
+
 def make_hamiltonian(path, c1=126030.0, c2=17890.0, c3=700.0, c4=-13300.0):
     """
     Generates Hamiltonian based on a pickle file